@@ -1,11 +1,28 @@
-from flask import Flask, request, jsonify,session
+from flask import Flask, request, jsonify,session, g, make_response
 from models import *
 from functools import wraps
+import os
+import sqlite3
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///ecommerce.db'  # Use SQLite for simplicity
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('ECOMMERCE_DATABASE_URI', 'sqlite:///ecommerce.db')  # Use SQLite for simplicity
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'your_secret_string_here'
+app.config['RESERVATION_HOLD_SECONDS'] = 600  # How long a reservation holds stock
+app.config['RESERVATION_MAX_QUANTITY'] = 5  # Most units a single reservation may hold
+app.config['RESERVATION_SWEEP_INTERVAL'] = 30  # Seconds between expired-hold sweeps
+app.config['RESERVATION_SWEEP_BATCH_SIZE'] = 500  # Expired holds released per sweep batch
+app.config['COMPRESS_MIN_SIZE'] = 500  # Responses smaller than this (bytes) are sent uncompressed
+app.config['COMPRESS_LEVEL'] = 6  # gzip level; brotli uses its own default quality
+app.config['SNAPSHOT_ENABLED'] = False  # Serve opted-in catalog reads from a read-only snapshot
+app.config['SNAPSHOT_PATH'] = os.path.join(app.instance_path, 'catalog_snapshot.db')  # Base name; each refresh writes a versioned file
+app.config['SNAPSHOT_REFRESH_INTERVAL'] = 30  # Seconds between snapshot refreshes
+app.config['SNAPSHOT_MAX_STALENESS'] = 120  # Older snapshots are ignored and reads go to the main database
+app.config['SNAPSHOT_BACKUP_PAGES'] = 256  # Pages copied per backup step before the live database is unlocked
 db.init_app(app)
 from functools import wraps
 def login_required(func):
@@ -16,12 +33,256 @@ def login_required(func):
         return func(*args, **kwargs)
     return wrapper
 import html
+import glob
+import gzip
+import threading
+import time
+from datetime import datetime, timedelta
+try:
+    import brotli  # Optional: brotli is only offered when the package is installed
+except ImportError:
+    brotli = None
 
 def sanitize_string(input_string):
     if input_string is not None:
         return html.escape(input_string)
     return None
 
+def select_fields(columns):
+    # Parse the ?fields= query parameter against the columns a list endpoint exposes
+    fields = request.args.get('fields')
+    if not fields:
+        return list(columns), None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in columns]
+    if not names or unknown:
+        return None, (jsonify({"error": f"Invalid fields. Allowed: {', '.join(columns)}"}), 400)
+    return names, None
+
+def rows_to_dicts(names, rows):
+    return [dict(zip(names, row)) for row in rows]
+
+def negotiate_encoding(accept_encoding):
+    # Prefer brotli when both sides support it, otherwise gzip
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+@app.after_request
+def compress_response(response):
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.content_length is None
+            or response.content_length < app.config['COMPRESS_MIN_SIZE']):
+        return response
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if encoding == 'br':
+        response.set_data(brotli.compress(data))
+    else:
+        response.set_data(gzip.compress(data, compresslevel=app.config['COMPRESS_LEVEL']))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# Read-only catalog snapshot, produced with the SQLite backup API by a single `flask refresh-snapshots` process
+snapshot_engine = create_engine(
+    'sqlite://',
+    creator=lambda: sqlite3.connect(f"file:{g.snapshot_path}?mode=ro", uri=True, check_same_thread=False),
+    poolclass=NullPool  # Fresh connection per request so the newest snapshot file is picked up
+)
+
+def snapshot_file(version):
+    # Every refresh writes a new versioned file, e.g. catalog_snapshot.<version>.db, where version is time.time_ns()
+    base, ext = os.path.splitext(app.config['SNAPSHOT_PATH'])
+    return f"{base}.{version}{ext}"
+
+def list_snapshots():
+    # Published snapshots as (version, path), newest first; files still being built end in .tmp and are not matched
+    base, ext = os.path.splitext(app.config['SNAPSHOT_PATH'])
+    snapshots = []
+    for path in glob.glob(snapshot_file('*')):
+        try:
+            snapshots.append((int(path[len(base) + 1:-len(ext)]), path))
+        except ValueError:
+            continue
+    return sorted(snapshots, reverse=True)
+
+def remove_old_snapshots():
+    # Keep the newest two, since a reader that picked the previous one just before the switch may still open it.
+    # Files still held open by a reader (Windows refuses to delete them) are retried on the next refresh
+    for _, path in list_snapshots()[2:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def refresh_catalog_snapshot():
+    # Copy the live database into a new file, keep only catalog and review tables, then publish it
+    snapshot_path = snapshot_file(time.time_ns())
+    tmp_path = snapshot_path + '.tmp'
+
+    source = db.engine.raw_connection()
+    target = sqlite3.connect(tmp_path)
+    try:
+        # Copy in small steps so the read lock on the live database is released between them
+        source.driver_connection.backup(target, pages=app.config['SNAPSHOT_BACKUP_PAGES'])
+        # Allowlist: everything but the catalog tables is dropped, including tables added later.
+        # secure_delete and VACUUM make sure no dropped rows survive in freed pages of the copy
+        target.execute('PRAGMA secure_delete=ON')
+        keep = {Product.__tablename__, Review.__tablename__}
+        for kind, name in target.execute(
+            "SELECT type, name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'"
+        ).fetchall():
+            if name not in keep:
+                target.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+        target.commit()
+        target.execute('VACUUM')
+    except Exception:
+        target.close()
+        os.remove(tmp_path)
+        raise
+    finally:
+        target.close()
+        source.close()
+
+    # Nobody has the new name open yet, so the rename also works on Windows
+    os.rename(tmp_path, snapshot_path)
+    remove_old_snapshots()
+
+def snapshot_reads(func):
+    # Opt-in for catalog GET routes: query through catalog_session() and report the snapshot age
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        g.catalog_session = db.session
+        if not app.config['SNAPSHOT_ENABLED']:
+            return func(*args, **kwargs)
+
+        snapshots = list_snapshots()
+        if not snapshots:
+            return func(*args, **kwargs)
+        version, g.snapshot_path = snapshots[0]
+        age = time.time() - version / 1e9
+        if age > app.config['SNAPSHOT_MAX_STALENESS']:
+            return func(*args, **kwargs)
+
+        snapshot_session = Session(bind=snapshot_engine)
+        try:
+            snapshot_session.connection()
+        except OperationalError:
+            # The file disappeared or cannot be opened; serve from the main database instead of failing
+            snapshot_session.close()
+            return func(*args, **kwargs)
+
+        g.catalog_session = snapshot_session
+        try:
+            response = make_response(func(*args, **kwargs))
+        finally:
+            snapshot_session.close()
+        response.headers['X-Snapshot-Age'] = f"{age:.1f}"
+        return response
+    return wrapper
+
+def catalog_session():
+    return g.get('catalog_session', db.session)
+
+@app.cli.command('refresh-snapshots')
+def refresh_snapshots_command():
+    """Keep the catalog snapshot fresh. Run exactly one of these per deployment."""
+    while True:
+        try:
+            refresh_catalog_snapshot()
+        except Exception:
+            app.logger.exception("Catalog snapshot refresh failed")
+        time.sleep(app.config['SNAPSHOT_REFRESH_INTERVAL'])
+
+def take_stock(product_id, quantity):
+    # Atomic conditional decrement: only succeeds if enough stock is left, no read-modify-write race
+    updated = Product.query.filter(
+        Product.id == product_id,
+        Product.stock >= quantity
+    ).update({Product.stock: Product.stock - quantity}, synchronize_session=False)
+    return updated == 1
+
+def release_reservation(reservation_id, product_id, quantity, now):
+    # Delete the expired hold first and restock only if this call removed it, so concurrent sweepers never restock twice
+    deleted = StockReservation.query.filter(
+        StockReservation.id == reservation_id,
+        StockReservation.expires_at <= now
+    ).delete(synchronize_session=False)
+    if deleted == 1:
+        Product.query.filter_by(id=product_id).update(
+            {Product.stock: Product.stock + quantity}, synchronize_session=False
+        )
+    return deleted == 1
+
+def release_expired_reservations():
+    # Return the stock of expired holds to their products, one batch at a time
+    batch_size = app.config['RESERVATION_SWEEP_BATCH_SIZE']
+    released = 0
+    while True:
+        now = datetime.utcnow()
+        expired = db.session.query(
+            StockReservation.id, StockReservation.product_id, StockReservation.quantity
+        ).filter(StockReservation.expires_at <= now).order_by(StockReservation.expires_at).limit(batch_size).all()
+        if not expired:
+            break
+
+        for reservation_id, product_id, quantity in expired:
+            if release_reservation(reservation_id, product_id, quantity, now):
+                released += 1
+        db.session.commit()
+
+        if len(expired) < batch_size:
+            break
+    return released
+
+def start_reservation_sweeper():
+    # Background thread that periodically releases expired holds
+    def sweep():
+        while True:
+            time.sleep(app.config['RESERVATION_SWEEP_INTERVAL'])
+            with app.app_context():
+                try:
+                    release_expired_reservations()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Reservation sweep failed")
+
+    sweeper = threading.Thread(target=sweep, name="reservation-sweeper", daemon=True)
+    sweeper.start()
+    return sweeper
+
+background_tasks = {"started": False}
+background_tasks_lock = threading.Lock()
+
+@app.before_request
+def start_background_tasks():
+    # Start the background threads once per process, so they run under flask run and WSGI servers too
+    if background_tasks["started"]:
+        return
+    with background_tasks_lock:
+        if background_tasks["started"]:
+            return
+        start_reservation_sweeper()
+        background_tasks["started"] = True
+
 @app.route('/login', methods=['POST'])
 def login():
     # Type checking and sanitization of inputs
@@ -148,16 +409,19 @@ def update_customer(id):
 @login_required  # Ensure the user is logged in
 @roles_required("Admin")  # Ensure the user has admin privileges
 def get_all_customers():
-    customers = User.query.filter_by(role="Customer").all()
-    return jsonify([
-        {
-            "id": customer.id,
-            "username": customer.username,
-            "full_name": customer.full_name,
-            "wallet": customer.wallet,
-        }
-        for customer in customers
-    ])
+    columns = {
+        "id": User.id,
+        "username": User.username,
+        "full_name": User.full_name,
+        "wallet": User.wallet,
+    }
+    names, error = select_fields(columns)
+    if error:
+        return error
+
+    # Only the requested columns are fetched from the database
+    customers = User.query.filter_by(role="Customer").with_entities(*[columns[name] for name in names]).all()
+    return jsonify(rows_to_dicts(names, customers))
 
 @app.route('/customers/<username>', methods=['GET'])
 @login_required  # Ensure the user is logged in
@@ -325,24 +589,28 @@ def update_product(product_id):
 
 @app.route('/sales/available-goods', methods=['GET'])
 @login_required  # Ensure the user is logged in
+@snapshot_reads  # May be served from the catalog snapshot
 def display_available_goods():
-    products = Product.query.filter(Product.stock > 0).all()
-    return jsonify([
-        {"name": product.name, "price": product.price}
-        for product in products
-    ])
+    columns = {"name": Product.name, "price": Product.price}
+    names, error = select_fields(columns)
+    if error:
+        return error
+
+    products = catalog_session().query(Product).filter(Product.stock > 0).with_entities(*[columns[name] for name in names]).all()
+    return jsonify(rows_to_dicts(names, products))
 
 
 
 @app.route('/sales/good-details/<int:product_id>', methods=['GET'])
 @login_required  # Ensure the user is logged in
 @roles_required("Admin", "Customer")  # Access limited to Admins and Customers
+@snapshot_reads  # May be served from the catalog snapshot
 def get_good_details(product_id):
     # Assuming there's a need to check if product_id is within a sensible range
     if product_id < 1:
         return jsonify({"error": "Invalid product ID"}), 400
 
-    product = Product.query.get(product_id)
+    product = catalog_session().get(Product, product_id)
     if not product:
         return jsonify({"error": "Product not found"}), 404
 
@@ -378,27 +646,116 @@ def process_sale():
         return jsonify({"error": "Customer not found or not authorized"}), 404
     if not product:
         return jsonify({"error": "Product not found"}), 404
-    if product.stock <= 0:
-        return jsonify({"error": "Product out of stock"}), 400
-    if customer.wallet < product.price:
-        return jsonify({"error": "Insufficient wallet balance"}), 400
+
+    # Checkout against an existing hold: the stock was already taken at reservation time
+    reservation_id = data.get('reservation_id')
+    if reservation_id is not None:
+        if not isinstance(reservation_id, int) or isinstance(reservation_id, bool):
+            return jsonify({"error": "Invalid reservation ID. It must be an integer."}), 400
+        if not (0 < reservation_id < 2**63):  # SQLite INTEGER range
+            return jsonify({"error": "Invalid reservation ID"}), 400
+
+        reservation = StockReservation.query.get(reservation_id)
+        if not reservation or reservation.customer_id != customer.id or reservation.product_id != product.id:
+            return jsonify({"error": "Reservation not found"}), 404
+        total_price = product.price * reservation.quantity
+        if customer.wallet < total_price:
+            return jsonify({"error": "Insufficient wallet balance"}), 400
+
+        # Consume the hold only if it has not expired, so the sweeper cannot also release it
+        consumed = StockReservation.query.filter(
+            StockReservation.id == reservation.id,
+            StockReservation.expires_at > datetime.utcnow()
+        ).delete(synchronize_session=False)
+        if not consumed:
+            db.session.rollback()
+            return jsonify({"error": "Reservation expired"}), 410
+        quantity = reservation.quantity
+    else:
+        quantity = 1
+        total_price = product.price
+        if customer.wallet < total_price:
+            return jsonify({"error": "Insufficient wallet balance"}), 400
+        if not take_stock(product.id, quantity):
+            return jsonify({"error": "Product out of stock"}), 400
 
     # Process the sale
-    customer.wallet -= product.price
-    product.stock -= 1
-    db.session.commit()
+    customer.wallet -= total_price
 
     # Save purchase history
-    new_purchase = PurchaseHistory(customer_id=customer.id, product_id=product.id)
-    db.session.add(new_purchase)
+    for _ in range(quantity):
+        db.session.add(PurchaseHistory(customer_id=customer.id, product_id=product.id))
     db.session.commit()
 
+    db.session.refresh(product)
     return jsonify({
         "message": "Purchase successful",
         "remaining_wallet_balance": customer.wallet,
         "remaining_stock": product.stock
     })
 
+@app.route('/sales/reserve', methods=['POST'])
+@login_required  # Ensure the user is logged in
+@roles_required("Customer")  # Access limited to Customers
+def reserve_product():
+    data = request.json
+
+    # Sanitize and validate the product name
+    product_name = sanitize_string(data.get('product_name'))
+    if not product_name:
+        return jsonify({"error": "Product name is required"}), 400
+
+    quantity = data.get('quantity', 1)
+    if not isinstance(quantity, int) or isinstance(quantity, bool):
+        return jsonify({"error": "Invalid data format for quantity"}), 400
+    max_quantity = app.config['RESERVATION_MAX_QUANTITY']
+    if not (0 < quantity <= max_quantity):
+        return jsonify({"error": f"Quantity must be an integer from 1 to {max_quantity}"}), 400
+
+    customer = User.query.filter_by(username=session.get('username'), role="Customer").first()
+    product = Product.query.filter_by(name=product_name).first()
+    if not customer:
+        return jsonify({"error": "Customer not found or not authorized"}), 404
+    if not product:
+        return jsonify({"error": "Product not found"}), 404
+
+    # A unique (customer_id, product_id) constraint allows one hold per customer and product,
+    # so the customer's own expired hold is released first to make room for the new one
+    now = datetime.utcnow()
+    expired = StockReservation.query.filter(
+        StockReservation.customer_id == customer.id,
+        StockReservation.product_id == product.id,
+        StockReservation.expires_at <= now
+    ).first()
+    if expired:
+        release_reservation(expired.id, expired.product_id, expired.quantity, now)
+        db.session.commit()
+
+    # Take the units before doing anything else so losers fail fast
+    if not take_stock(product.id, quantity):
+        return jsonify({"error": "Not enough stock available"}), 409
+
+    reservation = StockReservation(
+        customer_id=customer.id,
+        product_id=product.id,
+        quantity=quantity,
+        expires_at=now + timedelta(seconds=app.config['RESERVATION_HOLD_SECONDS'])
+    )
+    db.session.add(reservation)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request from this customer already holds the product; this also undoes take_stock
+        db.session.rollback()
+        return jsonify({"error": "You already have an active reservation for this product"}), 409
+
+    return jsonify({
+        "message": "Product reserved successfully",
+        "reservation_id": reservation.id,
+        "quantity": reservation.quantity,
+        "expires_at": reservation.expires_at.strftime('%Y-%m-%d %H:%M:%S')
+    }), 201
+
 @app.route('/sales/purchase-history/<int:customer_id>', methods=['GET'])
 @login_required  # Ensure the user is logged in
 @roles_required("Admin", "Customer")  # Allow both roles, but apply additional checks inside
@@ -411,14 +768,19 @@ def get_purchase_history(customer_id):
     if not customer or customer.role != "Customer":  # Ensure it is a valid customer
         return jsonify({"error": "Customer not found"}), 404
 
-    purchases = PurchaseHistory.query.filter_by(customer_id=customer_id).all()
-    history = [
-        {
-            "product_name": Product.query.get(purchase.product_id).name,
-            "purchase_time": purchase.purchase_time.strftime('%Y-%m-%d %H:%M:%S')  # Format datetime for readability
-        }
-        for purchase in purchases
-    ]
+    columns = {"product_name": Product.name, "purchase_time": PurchaseHistory.purchase_time}
+    names, error = select_fields(columns)
+    if error:
+        return error
+
+    # Join the product in the same query instead of loading it per purchase
+    purchases = PurchaseHistory.query.filter_by(customer_id=customer_id).join(
+        Product, Product.id == PurchaseHistory.product_id
+    ).with_entities(*[columns[name] for name in names]).all()
+    history = rows_to_dicts(names, purchases)
+    if "purchase_time" in names:
+        for purchase in history:
+            purchase["purchase_time"] = purchase["purchase_time"].strftime('%Y-%m-%d %H:%M:%S')  # Format datetime for readability
     return jsonify(history)
 
 # 1. Submit Review
@@ -512,21 +874,24 @@ def delete_review(review_id):
 @app.route('/reviews/product/<int:product_id>', methods=['GET'])
 @roles_required("Customer", "Admin")
 @login_required
+@snapshot_reads  # May be served from the catalog snapshot
 def get_product_reviews(product_id):
-    product = Product.query.get(product_id)
+    product = catalog_session().get(Product, product_id)
     if not product:
         return jsonify({"error": "Product not found"}), 404
 
-    reviews = Review.query.filter_by(product_id=product_id).all()
-    return jsonify([
-        {
-            "review_id": review.id,
-            "customer_id": review.customer_id,
-            "rating": review.rating,
-            "comment": review.comment
-        }
-        for review in reviews
-    ])
+    columns = {
+        "review_id": Review.id,
+        "customer_id": Review.customer_id,
+        "rating": Review.rating,
+        "comment": Review.comment
+    }
+    names, error = select_fields(columns)
+    if error:
+        return error
+
+    reviews = catalog_session().query(Review).filter_by(product_id=product_id).with_entities(*[columns[name] for name in names]).all()
+    return jsonify(rows_to_dicts(names, reviews))
 
 
 
@@ -0,0 +1,77 @@
+# bench_compression.py
+# Response size and latency of the list APIs with and without compression and ?fields= selection.
+# Uses a throwaway database, so instance/ecommerce.db is never touched:
+#   python bench_compression.py
+import os
+import tempfile
+import time
+
+WORK_DIR = tempfile.mkdtemp(prefix="ecommerce-bench-")
+os.environ['ECOMMERCE_DATABASE_URI'] = 'sqlite:///' + os.path.join(WORK_DIR, 'bench.db')
+
+from app import app, db
+from models import User, Product, Review, PurchaseHistory
+
+CUSTOMERS = 2000
+PRODUCTS = 2000
+REVIEWS = 2000  # All on product 1
+PURCHASES = 2000  # All by the first customer
+REPEATS = 50
+
+
+def seed():
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='benchadmin', password='benchpass', full_name='Bench Admin', age=40,
+                            address='1 Admin St', gender='Other', marital_status='Single', role='Admin'))
+        db.session.add_all([
+            User(username=f"customer-{i}", password='benchpass', full_name=f"Customer Number {i}", age=30,
+                 address=f"{i} Bench Street", gender='Other', marital_status='Single', role='Customer', wallet=100.0)
+            for i in range(CUSTOMERS)
+        ])
+        db.session.add_all([
+            Product(name=f"product-{i}", category='bench', price=10.0 + i, description='x' * 200, stock=100)
+            for i in range(PRODUCTS)
+        ])
+        db.session.flush()
+        customer_id = User.query.filter_by(username='customer-0').first().id
+        db.session.add_all([
+            Review(product_id=1, customer_id=customer_id, rating=4, comment='Solid product, would buy again. ' * 4)
+            for _ in range(REVIEWS)
+        ])
+        db.session.add_all([
+            PurchaseHistory(customer_id=customer_id, product_id=i % PRODUCTS + 1) for i in range(PURCHASES)
+        ])
+        db.session.commit()
+        return customer_id
+
+
+def measure(client, url, encoding):
+    headers = {'username': 'benchadmin'}
+    if encoding:
+        headers['Accept-Encoding'] = encoding
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        response = client.get(url, headers=headers)
+    elapsed = (time.perf_counter() - start) / REPEATS * 1000
+    assert response.status_code == 200, (url, response.status_code)
+    return len(response.get_data()), elapsed
+
+
+if __name__ == "__main__":
+    customer_id = seed()
+    client = app.test_client()
+    client.post('/login', json={'username': 'benchadmin', 'password': 'benchpass'})
+
+    cases = [
+        ("/customers", "/customers?fields=id,username"),
+        ("/sales/available-goods", "/sales/available-goods?fields=name"),
+        ("/reviews/product/1", "/reviews/product/1?fields=review_id,rating"),
+        (f"/sales/purchase-history/{customer_id}", f"/sales/purchase-history/{customer_id}?fields=product_name"),
+    ]
+    print(f"{'request':<48} {'encoding':<9} {'bytes':>9} {'ms/request':>11}")
+    for full_url, trimmed_url in cases:
+        for url in (full_url, trimmed_url):
+            for encoding in (None, 'gzip'):
+                size, elapsed = measure(client, url, encoding)
+                print(f"{url:<48} {encoding or 'identity':<9} {size:>9} {elapsed:>11.2f}")
@@ -0,0 +1,133 @@
+# bench_snapshot.py
+# Catalog read latency while a bulk write load runs, with snapshot mode off and on.
+# The writer and the snapshot refresher run as separate processes, as they would next to real app workers.
+# Uses a throwaway database, so instance/ecommerce.db is never touched:
+#   python bench_snapshot.py
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+# Set in the environment so spawned child processes use the same throwaway files
+WORK_DIR = os.environ.setdefault('ECOMMERCE_BENCH_DIR', tempfile.mkdtemp(prefix="ecommerce-bench-"))
+os.environ['ECOMMERCE_DATABASE_URI'] = 'sqlite:///' + os.path.join(WORK_DIR, 'bench.db')
+
+from app import app, db, refresh_catalog_snapshot
+from models import User, Product, Review
+
+app.config['SNAPSHOT_PATH'] = os.path.join(WORK_DIR, 'catalog_snapshot.db')
+app.config['SNAPSHOT_REFRESH_INTERVAL'] = 5
+app.config['SNAPSHOT_MAX_STALENESS'] = 15
+
+PRODUCTS = 2000
+REVIEWS_PER_PRODUCT = 10
+WRITE_BATCH = 5000  # Rows inserted per write transaction, like an inventory import
+PHASE_SECONDS = 10
+
+
+def seed():
+    with app.app_context():
+        db.create_all()
+        customer = User(username='benchuser', password='benchpass', full_name='Bench User', age=30,
+                        address='1 Bench St', gender='Other', marital_status='Single', role='Customer')
+        db.session.add(customer)
+        db.session.add_all([
+            Product(name=f"product-{i}", category='bench', price=10.0, description='x' * 200, stock=100)
+            for i in range(PRODUCTS)
+        ])
+        db.session.flush()
+        db.session.add_all([
+            Review(product_id=product_id, customer_id=customer.id, rating=4, comment='y' * 200)
+            for product_id in range(1, PRODUCTS + 1) for _ in range(REVIEWS_PER_PRODUCT)
+        ])
+        db.session.commit()
+
+
+def bulk_writer(stop):
+    # Back-to-back import transactions with a short pause between them
+    imported = 0
+    with app.app_context():
+        while not stop.is_set():
+            db.session.add_all([
+                Product(name=f"import-{imported + i}", category='import', price=5.0, description='z' * 200, stock=1)
+                for i in range(WRITE_BATCH)
+            ])
+            db.session.query(Product).filter(Product.category == 'bench').update(
+                {Product.stock: Product.stock + 1}, synchronize_session=False
+            )
+            db.session.commit()
+            imported += WRITE_BATCH
+            time.sleep(0.05)
+
+
+def snapshot_refresher(stop):
+    # Stands in for the single `flask refresh-snapshots` process
+    with app.app_context():
+        while not stop.is_set():
+            try:
+                refresh_catalog_snapshot()
+            except Exception as exc:
+                print(f"  refresh failed: {exc}", file=sys.stderr)
+            stop.wait(app.config['SNAPSHOT_REFRESH_INTERVAL'])
+
+
+def measure_reads(seconds):
+    client = app.test_client()
+    client.post('/login', json={'username': 'benchuser', 'password': 'benchpass'})
+    headers = {'username': 'benchuser'}
+    latencies, errors, from_snapshot = [], 0, 0
+    deadline = time.perf_counter() + seconds
+    product_id = 0
+    while time.perf_counter() < deadline:
+        product_id = product_id % PRODUCTS + 1
+        for url in (f"/sales/good-details/{product_id}", f"/reviews/product/{product_id}"):
+            start = time.perf_counter()
+            try:
+                response = client.get(url, headers=headers)
+                ok = response.status_code == 200
+                from_snapshot += 'X-Snapshot-Age' in response.headers
+            except Exception:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += not ok
+    return latencies, errors, from_snapshot
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_phase(label, snapshot, writes):
+    app.config['SNAPSHOT_ENABLED'] = snapshot
+    stop = multiprocessing.Event()
+    workers = []
+    if snapshot:
+        with app.app_context():
+            refresh_catalog_snapshot()
+        workers.append(multiprocessing.Process(target=snapshot_refresher, args=(stop,)))
+    if writes:
+        workers.append(multiprocessing.Process(target=bulk_writer, args=(stop,)))
+    for worker in workers:
+        worker.start()
+    time.sleep(1)  # Let the load get going before measuring
+
+    latencies, errors, from_snapshot = measure_reads(PHASE_SECONDS)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    print(f"{label:<32} reads={len(latencies):>6}  p50={percentile(latencies, 0.50):7.2f} ms  "
+          f"p99={percentile(latencies, 0.99):8.2f} ms  max={max(latencies):8.2f} ms  "
+          f"errors={errors}  from_snapshot={from_snapshot}")
+
+
+if __name__ == "__main__":
+    seed()
+    print(f"{PRODUCTS} products, {PRODUCTS * REVIEWS_PER_PRODUCT} reviews, {PHASE_SECONDS}s per phase, "
+          f"writer inserts {WRITE_BATCH} products per transaction, {os.cpu_count()} CPU(s)")
+    run_phase("idle, snapshot off", snapshot=False, writes=False)
+    run_phase("idle, snapshot on", snapshot=True, writes=False)
+    run_phase("bulk writes, snapshot off", snapshot=False, writes=True)
+    run_phase("bulk writes, snapshot on", snapshot=True, writes=True)
@@ -34,4 +34,15 @@ class PurchaseHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
-    purchase_time = db.Column(db.DateTime, default=db.func.now())
\ No newline at end of file
+    purchase_time = db.Column(db.DateTime, default=db.func.now())
+class StockReservation(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('customer_id', 'product_id'),  # One hold per customer and product
+        {"sqlite_autoincrement": True}  # Never reuse ids of consumed holds, so stale retries cannot hit a new hold
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Indexed so the sweeper can range-scan expired holds